@@ -0,0 +1,82 @@
+"""
+Persistent key-value cache (stdlib sqlite3) shared across runs
+"""
+import atexit
+import hashlib
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from backend.config import logger
+
+SQLITE_TIMEOUT = 5  # Seconds to wait when another process holds the write lock
+
+
+def make_key(*parts) -> str:
+    """Build a stable cache key from the given parts."""
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Thread-safe SQLite-backed cache, opened lazily on first use.
+    One connection is shared by all threads (calls are serialized by a lock),
+    and several processes can use the same file at once.
+    Best effort: a backend error is a miss on get and a no-op on set.
+    Set `enabled = False` to bypass lookups (fresh values are still stored).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path).with_suffix(".sqlite3")
+        self.enabled = True
+        self._db = None
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def _open(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # check_same_thread=False: the connection is shared, self._lock serializes its use
+            db = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            self._db = db
+            atexit.register(self.close)
+        return self._db
+
+    def _warn(self, e: Exception):
+        if not self._warned:
+            logger.warning(f"Cache {self.path} unavailable, continuing without it: {e}")
+            self._warned = True
+
+    def get(self, key: str, default=None):
+        """Return the cached value for key, or default on miss."""
+        if not self.enabled:
+            return default
+        with self._lock:
+            try:
+                row = self._open().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                return pickle.loads(row[0]) if row else default
+            except (sqlite3.Error, OSError, pickle.UnpicklingError) as e:
+                self._warn(e)
+                return default
+
+    def set(self, key: str, value):
+        """Store value under key."""
+        with self._lock:
+            try:
+                self._open().execute(
+                    "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, pickle.dumps(value))
+                )
+            except (sqlite3.Error, OSError, pickle.PicklingError) as e:
+                self._warn(e)
+
+    def close(self):
+        """Close the underlying connection."""
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except sqlite3.Error:
+                    pass
+                self._db = None
@@ -7,18 +7,18 @@ Usage:
     python3 fetch_only.py --all        # Fetch all time periods
     python3 fetch_only.py --period week # Fetch specific period
 """
-import json
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from backend.fetchers.reddit import fetch_subreddit_posts, fetch_top_comment
+from backend.fetchers.reddit import fetch_subreddit_posts, fetch_top_comments
 from backend.db.nocodb import get_existing_post_ids
+from backend.cli.storage import save_posts
 from backend.config import SUBREDDITS, logger
 
 # Configuration
 OUTPUT_DIR = Path(__file__).parent / "data"
-REDDIT_DELAY = 2.0  # Seconds between Reddit requests (be nice)
 MAX_POSTS_PER_SUBREDDIT = 100  # Per run
 
 TIME_PERIODS = ["day", "week", "month", "year", "all"]
@@ -38,48 +38,55 @@ def fetch_and_save(time_filter: str = "day", skip_existing: bool = True) -> dict
     all_posts = []
     stats = {"fetched": 0, "skipped": 0, "errors": 0}
 
-    for subreddit in SUBREDDITS:
+    def fetch_listing(subreddit):
         logger.info(f"Fetching r/{subreddit} ({time_filter})...")
-
-        try:
-            posts = list(fetch_subreddit_posts(
-                subreddit,
-                time_filter=time_filter,
-                limit=MAX_POSTS_PER_SUBREDDIT
-            ))
-            logger.info(f"  Got {len(posts)} posts from API")
-
-            for post in posts:
-                if post["id"] in existing_ids:
-                    stats["skipped"] += 1
-                    continue
-
-                # Fetch top comment (with delay)
-                time.sleep(REDDIT_DELAY)
-                try:
-                    top_comment = fetch_top_comment(post["id"], subreddit)
-                    if top_comment:
-                        post.update(top_comment)
-                except Exception as e:
-                    logger.warning(f"  Comment fetch failed for {post['id']}: {e}")
-
-                all_posts.append(post)
-                existing_ids.add(post["id"])  # Don't fetch same post twice
-                stats["fetched"] += 1
-
-                logger.info(f"  [{stats['fetched']}] {post['title'][:50]}...")
-
-        except Exception as e:
-            logger.error(f"  Error fetching r/{subreddit}: {e}")
-            stats["errors"] += 1
+        return list(fetch_subreddit_posts(
+            subreddit,
+            time_filter=time_filter,
+            limit=MAX_POSTS_PER_SUBREDDIT
+        ))
+
+    # The next subreddit's listing downloads in the background while the
+    # current subreddit's top comments are fetched
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        next_listing = prefetcher.submit(fetch_listing, SUBREDDITS[0]) if SUBREDDITS else None
+
+        for i, subreddit in enumerate(SUBREDDITS):
+            listing = next_listing
+            if i + 1 < len(SUBREDDITS):
+                next_listing = prefetcher.submit(fetch_listing, SUBREDDITS[i + 1])
+
+            try:
+                posts = listing.result()
+                logger.info(f"  Got {len(posts)} posts from API")
+
+                new_posts = []
+                for post in posts:
+                    if post["id"] in existing_ids:
+                        stats["skipped"] += 1
+                        continue
+
+                    new_posts.append(post)
+                    existing_ids.add(post["id"])  # Don't fetch same post twice
+
+                # Fetch top comments (concurrent, rate limited by the fetcher)
+                fetch_top_comments(new_posts, subreddit)
+
+                all_posts.extend(new_posts)
+                for post in new_posts:
+                    stats["fetched"] += 1
+                    logger.info(f"  [{stats['fetched']}] {post['title'][:50]}...")
+
+            except Exception as e:
+                logger.error(f"  Error fetching r/{subreddit}: {e}")
+                stats["errors"] += 1
 
     # Save to file
     if all_posts:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = OUTPUT_DIR / f"raw_posts_{timestamp}.json"
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(all_posts, f, ensure_ascii=False, indent=2)
+        save_posts(output_file, all_posts)
 
         logger.info(f"Saved {len(all_posts)} posts to {output_file}")
         stats["output_file"] = str(output_file)
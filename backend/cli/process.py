@@ -6,13 +6,16 @@ Usage:
     python3 process_only.py                          # Process latest raw file
     python3 process_only.py --file data/raw_posts_xxx.json  # Process specific file
     python3 process_only.py --batch 10               # Process in batches of 10
+    python3 process_only.py --force                  # Ignore cached AI responses
 """
 import json
 import time
 import argparse
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from backend.processors.ai import categorize_and_summarize, extract_financial_data
+from backend.processors.ai import categorize_and_summarize, extract_financial_data, llm_cache
+from backend.cli.storage import save_posts
 from backend.config import logger
 
 # Configuration
@@ -73,9 +76,10 @@ def process_posts_with_retry(posts: list[dict], batch_size: int = 10) -> list[di
                 # Categorize and summarize
                 enriched = categorize_and_summarize(post.copy())
 
-                # Extract financial data (always works, no API)
-                full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
-                enriched["extracted_data"] = extract_financial_data(full_text)
+                # Extract financial data (always works, no API) if the AI step didn't
+                if "extracted_data" not in enriched:
+                    full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
+                    enriched["extracted_data"] = extract_financial_data(full_text)
 
                 processed.append(enriched)
                 consecutive_429s = 0  # Reset counter
@@ -116,8 +120,12 @@ def main():
     parser.add_argument("--file", type=str, help="Specific raw file to process")
     parser.add_argument("--batch", type=int, default=10, help="Batch size for checkpoints")
     parser.add_argument("--all-unprocessed", action="store_true", help="Process all unprocessed files")
+    parser.add_argument("--force", action="store_true", help="Ignore cached AI responses")
     args = parser.parse_args()
 
+    if args.force:
+        llm_cache.enabled = False
+
     logger.info("=" * 50)
     logger.info("PROCESS ONLY - AI Categorization")
     logger.info("=" * 50)
@@ -159,19 +167,15 @@ def main():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = DATA_DIR / f"processed_posts_{timestamp}_from_{input_file.stem}.json"
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(processed, f, ensure_ascii=False, indent=2)
+        save_posts(output_file, processed)
 
         logger.info(f"Saved {len(processed)} processed posts to {output_file}")
 
         # Stats
-        categories = {}
-        for p in processed:
-            cat = p.get("category", "Autre")
-            categories[cat] = categories.get(cat, 0) + 1
+        categories = Counter(p.get("category", "Autre") for p in processed)
 
         logger.info("Categories distribution:")
-        for cat, count in sorted(categories.items(), key=lambda x: -x[1]):
+        for cat, count in categories.most_common():
             logger.info(f"  {cat}: {count}")
 
 
@@ -7,11 +7,11 @@ Usage:
     python3 push_only.py --file data/processed_xxx.json  # Push specific file
     python3 push_only.py --all-unpushed              # Push all unpushed files
 """
-import json
 import argparse
 from datetime import datetime
 from pathlib import Path
-from backend.db.nocodb import push_post, get_existing_post_ids
+from backend.cli.storage import iter_posts
+from backend.db.nocodb import push_posts, is_configured
 from backend.config import logger
 
 # Configuration
@@ -40,37 +40,6 @@ def find_unpushed_files() -> list[Path]:
     return sorted(unpushed, key=lambda f: f.stat().st_mtime)
 
 
-def push_posts_to_db(posts: list[dict]) -> dict:
-    """
-    Push posts to NocoDB, skipping duplicates.
-    Returns stats dict.
-    """
-    existing_ids = get_existing_post_ids()
-    logger.info(f"Found {len(existing_ids)} existing posts in DB")
-
-    stats = {"pushed": 0, "skipped": 0, "errors": 0}
-
-    for i, post in enumerate(posts):
-        post_id = post.get("id")
-
-        if post_id in existing_ids:
-            stats["skipped"] += 1
-            continue
-
-        try:
-            if push_post(post):
-                stats["pushed"] += 1
-                existing_ids.add(post_id)
-                logger.info(f"  [{stats['pushed']}] Pushed: {post.get('title', '')[:40]}...")
-            else:
-                stats["errors"] += 1
-        except Exception as e:
-            logger.error(f"  Error pushing {post_id}: {e}")
-            stats["errors"] += 1
-
-    return stats
-
-
 def mark_as_pushed(file_path: Path):
     """Move/copy file to pushed directory to track what's been pushed."""
     PUSHED_DIR.mkdir(exist_ok=True)
@@ -107,26 +76,28 @@ def main():
             return
         files_to_push = [latest]
 
+    if not args.dry_run and not is_configured():
+        logger.error("NocoDB not configured - set NOCODB_API_TOKEN and NOCODB_TABLE_ID in .env")
+        return
+
     total_stats = {"pushed": 0, "skipped": 0, "errors": 0}
 
     for input_file in files_to_push:
         logger.info(f"\nPushing: {input_file}")
 
-        # Load processed posts
-        with open(input_file, "r", encoding="utf-8") as f:
-            posts = json.load(f)
-
-        logger.info(f"Loaded {len(posts)} posts")
-
-        if not posts:
-            continue
+        # Stream processed posts (the file is never fully loaded)
+        posts = iter_posts(input_file)
 
         if args.dry_run:
-            logger.info(f"[DRY RUN] Would push {len(posts)} posts")
+            logger.info(f"[DRY RUN] Would push {sum(1 for _ in posts)} posts")
             continue
 
         # Push to DB
-        stats = push_posts_to_db(posts)
+        stats = push_posts(posts)
+
+        if not any(stats.values()):
+            logger.info("No posts in file")
+            continue
 
         # Mark as pushed
         mark_as_pushed(input_file)
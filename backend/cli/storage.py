@@ -0,0 +1,28 @@
+"""
+Helpers for the JSON files passed between CLI steps (data/*.json)
+"""
+import os
+from pathlib import Path
+from typing import Iterator
+import ijson
+import orjson
+
+
+def iter_posts(path: Path) -> Iterator[dict]:
+    """
+    Yield posts one by one from a JSON array file without loading it whole.
+    Floats stay floats (ijson would otherwise return Decimal).
+    """
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
+
+
+def save_posts(path: Path, posts: list[dict]):
+    """
+    Write posts as indented UTF-8 JSON in one write (orjson).
+    Written to a temp file then renamed, so readers never see a partial file.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(posts, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
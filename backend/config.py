@@ -4,6 +4,9 @@ Grepr config
 import os
 import re
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,10 +19,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger('grepr')
 
+_SUBREDDIT_RE = re.compile(r'^[a-zA-Z0-9_]{3,21}$')
 
+
+@lru_cache(maxsize=1024)
 def validate_subreddit_name(name: str) -> bool:
     """Validate subreddit name (alphanumeric and underscore only, 3-21 chars)."""
-    return bool(re.match(r'^[a-zA-Z0-9_]{3,21}$', name))
+    return _SUBREDDIT_RE.match(name) is not None
 
 
 # Reddit settings - validate subreddit names
@@ -50,22 +56,36 @@ MIN_SCORE = 10  # Minimum upvotes to include
 POSTS_PER_REQUEST = 100  # Max 100 per Reddit API
 TIME_FILTER = "all"  # hour, day, week, month, year, all
 
-# AI Provider selection: "groq" or "deepseek"
-AI_PROVIDER = os.getenv("AI_PROVIDER", "groq")
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Environment-driven settings, read once from .env / the environment."""
+    ai_provider: str           # "groq" or "deepseek"
+    groq_api_key: str | None
+    deepseek_api_key: str | None
+    nocodb_base_url: str
+    nocodb_api_token: str | None
+    nocodb_table_id: str | None
+
+
+SETTINGS = Settings(
+    ai_provider=os.getenv("AI_PROVIDER", "groq"),
+    groq_api_key=os.getenv("GROQ_API_KEY"),
+    deepseek_api_key=os.getenv("DEEPSEEK_API_KEY"),
+    nocodb_base_url=os.getenv("NOCODB_BASE_URL", "http://localhost:8080"),
+    nocodb_api_token=os.getenv("NOCODB_API_TOKEN"),
+    nocodb_table_id=os.getenv("NOCODB_TABLE_ID"),
+)
 
 # Groq API
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = "llama-3.3-70b-versatile"  # Fast and capable
 
 # DeepSeek API (alternative when Groq is rate-limited)
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_MODEL = "deepseek-chat"  # DeepSeek V3
 DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 
-# NocoDB
-NOCODB_BASE_URL = os.getenv("NOCODB_BASE_URL", "http://localhost:8080")
-NOCODB_API_TOKEN = os.getenv("NOCODB_API_TOKEN")
-NOCODB_TABLE_ID = os.getenv("NOCODB_TABLE_ID")
+# Persistent caches (AI responses, ...)
+CACHE_DIR = Path(__file__).parent.parent / ".cache"
 
 # Categories for AI classification - Extended to reduce "Autre"
 CATEGORIES = [
@@ -87,6 +107,9 @@ CATEGORIES = [
     "Autre"
 ]
 
+# O(1) category lookup / stable index for each category
+CATEGORY_INDEX = {name: i for i, name in enumerate(CATEGORIES)}
+
 # Category descriptions for AI prompt
 CATEGORY_DESCRIPTIONS = {
     "ETF": "Posts sur les ETF (CW8, WPEA, S&P500, MSCI World, Nasdaq, etc.)",
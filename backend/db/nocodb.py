@@ -3,72 +3,128 @@ NocoDB client - pushes posts to the database
 """
 import json
 import requests
-from backend.config import NOCODB_BASE_URL, NOCODB_API_TOKEN, NOCODB_TABLE_ID
+from itertools import chain
+from typing import Iterable
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from backend.config import SETTINGS, logger
+
+BULK_SIZE = 50  # Records per bulk insert request
 
 
 def get_headers():
     """Get headers for NocoDB API requests."""
     return {
-        "xc-token": NOCODB_API_TOKEN,
+        "xc-token": SETTINGS.nocodb_api_token,
         "Content-Type": "application/json"
     }
 
 
-def get_existing_post_ids() -> set:
-    """
-    Get all existing post IDs from NocoDB to avoid duplicates.
-    Uses pagination to handle more than 1000 posts.
+# Shared session: reuses TCP/TLS connections across paginated and bulk requests
+_session = requests.Session()
+_session.headers.update(get_headers())
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3),  # POST isn't retried (not idempotent)
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+def is_configured() -> bool:
+    """True when the NocoDB token and table ID are set in .env."""
+    return bool(SETTINGS.nocodb_api_token and SETTINGS.nocodb_table_id)
+
+
+def records_url(suffix: str = "") -> str:
+    """URL of the configured table's records endpoint."""
+    return f"{SETTINGS.nocodb_base_url}/api/v2/tables/{SETTINGS.nocodb_table_id}/records{suffix}"
+
+
+def paginate_records(where: str | None = None, fields: str | None = None, limit: int = 1000):
     """
-    if not NOCODB_API_TOKEN or not NOCODB_TABLE_ID:
-        print("Warning: NocoDB not configured, skipping duplicate check")
-        return set()
+    Yield table records page by page (instead of building one big list),
+    so callers can start working before the last page arrives.
 
-    url = f"{NOCODB_BASE_URL}/api/v2/tables/{NOCODB_TABLE_ID}/records"
-    existing_ids = set()
+    Args:
+        where: Optional NocoDB filter, e.g. "(category,eq,Autre)"
+        fields: Optional comma-separated list of fields to return
+        limit: Page size
+    """
     offset = 0
-    page_size = 1000
 
     while True:
-        params = {"fields": "reddit_id", "limit": page_size, "offset": offset}
+        params = {"limit": limit, "offset": offset}
+        if where:
+            params["where"] = where
+        if fields:
+            params["fields"] = fields
 
-        try:
-            response = requests.get(url, headers=get_headers(), params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = _session.get(records_url(), params=params)
+        response.raise_for_status()
+        records = response.json().get("list", [])
+        if not records:
+            return
 
-            records = data.get("list", [])
-            if not records:
-                break
+        yield from records
 
-            for record in records:
-                if record.get("reddit_id"):
-                    existing_ids.add(record["reddit_id"])
+        # If we got fewer than limit, we're done
+        if len(records) < limit:
+            return
 
-            # If we got fewer than page_size, we're done
-            if len(records) < page_size:
-                break
+        offset += limit
 
-            offset += page_size
 
-        except requests.RequestException as e:
-            print(f"Error fetching existing posts: {e}")
-            break
+def _count_records(where: str | None = None) -> int:
+    """Get the number of (matching) records in the table (one small request)."""
+    response = _session.get(records_url("/count"), params={"where": where} if where else None)
+    response.raise_for_status()
+    return response.json().get("count")
 
-    return existing_ids
 
+# Only rows that have a reddit_id (filtered server-side)
+_HAS_REDDIT_ID = "(reddit_id,notblank)"
 
-def push_post(post: dict) -> bool:
+# Last full ID scan, reused while the table's row count is unchanged
+_existing_ids_cache = {"count": None, "ids": set()}
+
+
+def get_existing_post_ids(refresh: bool = False) -> set:
     """
-    Push a single post to NocoDB.
-    Returns True if successful.
+    Get all existing post IDs from NocoDB to avoid duplicates.
+    Uses pagination to handle more than 1000 posts.
+    The table is only re-scanned when its row count changed since the last
+    call (or refresh=True); otherwise the previous result is reused.
     """
-    if not NOCODB_API_TOKEN or not NOCODB_TABLE_ID:
-        print("Warning: NocoDB not configured")
-        return False
+    if not is_configured():
+        logger.warning("NocoDB not configured, skipping duplicate check")
+        return set()
+
+    try:
+        count = _count_records(where=_HAS_REDDIT_ID)
+    except requests.RequestException as e:
+        logger.error(f"Error counting existing posts: {e}")
+        count = None
+
+    if not refresh and count is not None and count == _existing_ids_cache["count"]:
+        return set(_existing_ids_cache["ids"])  # Copy: callers add to it
+
+    existing_ids = set()
+    try:
+        for record in paginate_records(where=_HAS_REDDIT_ID, fields="reddit_id"):
+            existing_ids.add(record["reddit_id"])
+    except requests.RequestException as e:
+        logger.error(f"Error fetching existing posts: {e}")
+        return existing_ids  # Partial result, don't cache it
+
+    _existing_ids_cache["count"] = count
+    _existing_ids_cache["ids"] = set(existing_ids)
+    return existing_ids
 
-    url = f"{NOCODB_BASE_URL}/api/v2/tables/{NOCODB_TABLE_ID}/records"
 
-    # Map post data to NocoDB fields
+def build_record(post: dict) -> dict:
+    """Map post data to NocoDB fields."""
     extracted = post.get("extracted_data") or {}
 
     # Safe JSON serialization
@@ -77,11 +133,13 @@ def push_post(post: dict) -> bool:
     except (TypeError, ValueError):
         extracted_json = None
 
-    # Safe max amount extraction
-    amounts = extracted.get("amounts") or []
-    montant_max = max(amounts) if amounts else None
+    # Max amount is computed by the extractor (older files only have "amounts")
+    if "montant_max" in extracted:
+        montant_max = extracted["montant_max"]
+    else:
+        montant_max = max(extracted.get("amounts") or [], default=None)
 
-    record = {
+    return {
         "reddit_id": post.get("id"),
         "subreddit": post.get("subreddit"),
         "title": post.get("title"),
@@ -107,29 +165,84 @@ def push_post(post: dict) -> bool:
         "montant_max": montant_max,
     }
 
+
+def push_post(post: dict) -> bool:
+    """
+    Push a single post to NocoDB.
+    Returns True if successful.
+    """
+    if not is_configured():
+        logger.warning("NocoDB not configured")
+        return False
+
     try:
-        response = requests.post(url, headers=get_headers(), json=record)
+        response = _session.post(records_url(), json=build_record(post))
         response.raise_for_status()
         return True
     except requests.RequestException as e:
-        print(f"Error pushing post {post.get('id')}: {e}")
+        logger.error(f"Error pushing post {post.get('id')}: {e}")
         return False
 
 
-def push_posts(posts: list[dict]) -> dict:
+def push_posts_bulk(posts: list[dict]) -> int:
+    """
+    Push a batch of posts to NocoDB in a single request (array body).
+    Falls back to one request per post if the bulk insert fails,
+    so a single bad record doesn't drop the whole batch.
+    Returns the number of posts pushed.
+    """
+    if not posts:
+        return 0
+
+    if not is_configured():
+        logger.warning("NocoDB not configured")
+        return 0
+
+    try:
+        response = _session.post(records_url(), json=[build_record(p) for p in posts])
+        response.raise_for_status()
+        return len(posts)
+    except requests.RequestException as e:
+        logger.warning(f"Bulk push of {len(posts)} posts failed, retrying one by one: {e}")
+
+    return sum(1 for post in posts if push_post(post))
+
+
+def push_posts(posts: Iterable[dict]) -> dict:
     """
     Push multiple posts to NocoDB, skipping duplicates.
+    New posts are sent in batches of BULK_SIZE, so posts can be streamed in.
     Returns stats dict with counts.
     """
-    if not NOCODB_API_TOKEN or not NOCODB_TABLE_ID:
-        print("⚠️  NocoDB not configured - set NOCODB_API_TOKEN and NOCODB_TABLE_ID in .env")
+    if not is_configured():
+        logger.warning("NocoDB not configured - set NOCODB_API_TOKEN and NOCODB_TABLE_ID in .env")
         return {"pushed": 0, "skipped": 0, "errors": 0}
 
+    stats = {"pushed": 0, "skipped": 0, "errors": 0}
+
+    # Nothing to push: don't pay for the duplicate check
+    posts = iter(posts)
+    first = next(posts, None)
+    if first is None:
+        return stats
+    posts = chain([first], posts)
+
     # Get existing IDs to avoid duplicates
     existing_ids = get_existing_post_ids()
-    print(f"Found {len(existing_ids)} existing posts in NocoDB")
+    logger.info(f"Found {len(existing_ids)} existing posts in NocoDB")
 
-    stats = {"pushed": 0, "skipped": 0, "errors": 0}
+    batch = []
+
+    def flush():
+        try:
+            pushed = push_posts_bulk(batch)
+        except Exception as e:
+            logger.error(f"  Error pushing batch of {len(batch)}: {e}")
+            pushed = 0
+        stats["pushed"] += pushed
+        stats["errors"] += len(batch) - pushed
+        logger.info(f"  [{stats['pushed']}] Pushed {pushed}/{len(batch)} posts")
+        batch.clear()
 
     for post in posts:
         post_id = post.get("id")
@@ -138,11 +251,13 @@ def push_posts(posts: list[dict]) -> dict:
             stats["skipped"] += 1
             continue
 
-        if push_post(post):
-            stats["pushed"] += 1
-            print(f"  ✓ Pushed: {post.get('title', '')[:50]}...")
-        else:
-            stats["errors"] += 1
+        existing_ids.add(post_id)  # Don't push the same post twice
+        batch.append(post)
+        if len(batch) >= BULK_SIZE:
+            flush()
+
+    if batch:
+        flush()
 
     return stats
 
@@ -151,7 +266,7 @@ def push_posts(posts: list[dict]) -> dict:
 if __name__ == "__main__":
     print("Testing NocoDB client...")
 
-    if not NOCODB_API_TOKEN:
+    if not SETTINGS.nocodb_api_token:
         print("❌ NOCODB_API_TOKEN not set in .env")
         print("\nTo configure NocoDB:")
         print("1. Open NocoDB and create a new base/table")
@@ -1,108 +1,270 @@
 """
 Fetches Reddit posts via .json endpoint (no auth needed)
 """
+import ijson
+import msgspec
 import requests
+import threading
 import time
-from datetime import datetime
-from typing import Generator
-from backend.config import SUBREDDITS, MIN_SCORE, POSTS_PER_REQUEST, TIME_FILTER, USER_AGENT
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generator, Iterable, Iterator
+from backend.config import SUBREDDITS, MIN_SCORE, POSTS_PER_REQUEST, TIME_FILTER, USER_AGENT, CACHE_DIR, logger
+from backend.cache import DiskCache
+from backend.ratelimit import RateLimiter
 
+_REDDIT_BASE = "https://reddit.com"  # Prefix for post permalinks
 
-def fetch_subreddit_posts(subreddit: str, time_filter: str = TIME_FILTER, limit: int = POSTS_PER_REQUEST) -> Generator[dict, None, None]:
+COMMENT_WORKERS = 8  # Concurrent top-comment requests per subreddit
+REDDIT_REQUESTS_PER_SECOND = 1.0  # Cap on all Reddit requests, listings and comments (60/min)
+MIN_COMMENTS_FOR_FETCH = 1  # Posts with fewer comments have no top comment to fetch
+COMMENT_QUEUE_SIZE = 16  # Posts allowed to wait for a comment worker while the listing streams
+
+RATE_LIMIT_MIN_REMAINING = 2  # Pause when fewer requests than this are left in the window
+RATE_LIMIT_MAX_WAIT = 600  # Reddit windows are 10 minutes
+
+
+class _CommentData(msgspec.Struct):
+    id: str | None = None
+    body: str | None = None
+    score: int = 0
+    author: str | None = None
+
+
+class _CommentChild(msgspec.Struct):
+    kind: str = ""
+    data: _CommentData = msgspec.field(default_factory=_CommentData)
+
+
+class _CommentListingData(msgspec.Struct):
+    children: list[_CommentChild] = []
+
+
+class _CommentListing(msgspec.Struct):
+    data: _CommentListingData = msgspec.field(default_factory=_CommentListingData)
+
+
+# Comments response is [post listing, comment listing]; the post part is
+# only validated (Raw), and unknown comment fields are skipped, not decoded
+_comments_decoder = msgspec.json.Decoder(tuple[msgspec.Raw, _CommentListing])
+
+_reddit_limiter = RateLimiter(REDDIT_REQUESTS_PER_SECOND)
+
+# Top comments cached across runs, keyed on (post_id, num_comments)
+comment_cache = DiskCache(CACHE_DIR / "comments")
+
+# Shared session: keep-alive across pagination and per-post comment requests
+_session = requests.Session()
+_session.headers.update({
+    "User-Agent": USER_AGENT,
+    "Accept": "application/json",
+    # Accept-Encoding is left to requests: gzip, deflate, plus br when brotli is installed
+})
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=COMMENT_WORKERS + 1,  # Comment workers plus the listing being streamed
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+def _truncate(text: str | None, max_length: int) -> str:
+    """Limit text length; empty or missing (null) text becomes ""."""
+    if not text:
+        return ""
+    return text[:max_length] if len(text) > max_length else text
+
+
+def _respect_rate_limit(response: requests.Response):
     """
-    Fetch posts from a subreddit using .json endpoint.
-    Yields posts one by one, handling pagination automatically.
+    When Reddit's rate-limit budget is almost spent, hold back every thread's
+    next request until the window resets (x-ratelimit-remaining /
+    x-ratelimit-reset headers) by deferring the shared limiter.
     """
-    base_url = f"https://www.reddit.com/r/{subreddit}/top/.json"
-    headers = {"User-Agent": USER_AGENT}
-    after = None
-    total_fetched = 0
+    try:
+        remaining = float(response.headers.get("x-ratelimit-remaining", RATE_LIMIT_MIN_REMAINING))
+        reset = float(response.headers.get("x-ratelimit-reset", 0))
+    except ValueError:
+        return
 
-    while True:
-        params = {
-            "t": time_filter,
-            "limit": min(limit, 100),  # Max 100 per request
-            "raw_json": 1  # Get unescaped JSON
-        }
-        if after:
-            params["after"] = after
+    if remaining < RATE_LIMIT_MIN_REMAINING:
+        _reddit_limiter.defer(min(reset, RATE_LIMIT_MAX_WAIT))
 
+
+_LISTING_CHILD = "data.children.item"
+_LISTING_AFTER = "data.after"
+
+
+def _stream_listing(url: str, params: dict) -> Generator[dict, None, str | None]:
+    """
+    Yield the data dict of each listing child as it is parsed from the
+    response body, instead of buffering and decoding the whole page first.
+    Returns the page's `data.after` cursor (None on the last page).
+    """
+    after = None
+    builder = None  # Builds the child currently being parsed
+
+    _reddit_limiter.acquire()  # Shared with comment requests, across threads
+    with _session.get(url, params=params, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True  # Let urllib3 undo gzip/br
         try:
-            response = requests.get(base_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching r/{subreddit}: {e}")
-            break
+            for prefix, event, value in ijson.parse(response.raw, use_float=True):
+                if builder is not None:
+                    builder.event(event, value)
+                    if prefix == _LISTING_CHILD and event == "end_map":
+                        yield builder.value.get("data", {})
+                        builder = None
+                elif prefix == _LISTING_CHILD and event == "start_map":
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                elif prefix == _LISTING_AFTER:
+                    after = value
+        finally:
+            _respect_rate_limit(response)  # Once the page is read, never with the body pending
 
-        posts = data.get("data", {}).get("children", [])
-        if not posts:
-            break
+    return after
 
-        for post in posts:
-            post_data = post.get("data", {})
-            score = post_data.get("score", 0)
 
-            # Filter by minimum score
-            if score >= MIN_SCORE:
-                # Convert Unix timestamp to readable datetime
-                created_utc = post_data.get("created_utc", 0)
-                created_at = datetime.utcfromtimestamp(created_utc).strftime("%Y-%m-%d %H:%M:%S") if created_utc else None
-
-                yield {
-                    "id": post_data.get("id"),
-                    "subreddit": subreddit,
-                    "title": post_data.get("title"),
-                    "selftext": post_data.get("selftext", "")[:2000],  # Limit text length
-                    "score": score,
-                    "num_comments": post_data.get("num_comments", 0),
-                    "created_utc": created_utc,
-                    "created_at": created_at,  # Human-readable datetime
-                    "url": f"https://reddit.com{post_data.get('permalink')}",
-                    "author": post_data.get("author"),
-                    "upvote_ratio": post_data.get("upvote_ratio", 0),
-                }
-                total_fetched += 1
+def _row_from_post_data(post_data: dict[str, Any], subreddit: str) -> dict[str, Any]:
+    """Build our post dict from the data of a Reddit listing child."""
+    # Convert Unix timestamp to readable datetime
+    created_utc: float = post_data.get("created_utc", 0)
+    created_at: str | None = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(created_utc)) if created_utc else None
 
-        # Get next page token
-        after = data.get("data", {}).get("after")
-        if not after:
-            break
+    return {
+        "id": post_data.get("id"),
+        "subreddit": subreddit,
+        "title": post_data.get("title"),
+        "selftext": _truncate(post_data.get("selftext"), 2000),  # Limit text length
+        "score": post_data.get("score", 0),
+        "num_comments": post_data.get("num_comments", 0),
+        "created_utc": created_utc,
+        "created_at": created_at,  # Human-readable datetime
+        "url": _REDDIT_BASE + (post_data.get("permalink") or ""),
+        "author": post_data.get("author"),
+        "upvote_ratio": post_data.get("upvote_ratio", 0),
+    }
 
-        # Rate limiting - be nice to Reddit
-        time.sleep(1)
 
-    print(f"Fetched {total_fetched} posts from r/{subreddit} (score >= {MIN_SCORE})")
+def _paginate(url: str, params: dict) -> Iterator[dict]:
+    """
+    Yield the data of every child across all pages of a listing, following
+    the `data.after` cursor until Reddit returns none.
+    """
+    params = dict(params)
+    while True:
+        # Pages can be short and still have a next page: only the cursor says when to stop
+        params["after"] = yield from _stream_listing(url, params)
+        if not params["after"]:
+            return
 
 
-def fetch_top_comment(post_id: str, subreddit: str) -> dict | None:
+def fetch_subreddit_posts(subreddit: str, time_filter: str = TIME_FILTER, limit: int = POSTS_PER_REQUEST) -> Generator[dict, None, None]:
+    """
+    Fetch posts from a subreddit using .json endpoint.
+    Yields posts one by one, handling pagination automatically.
+    """
+    base_url = f"https://www.reddit.com/r/{subreddit}/top/.json"
+    params = {
+        "t": time_filter,
+        "limit": min(limit, 100),  # Max 100 per request
+        "raw_json": 1  # Get unescaped JSON
+    }
+    total_fetched = 0
+
+    # Posts are parsed (and yielded) while each page is still downloading
+    try:
+        for post_data in _paginate(base_url, params):
+            # Filter by minimum score
+            if post_data.get("score", 0) >= MIN_SCORE:
+                yield _row_from_post_data(post_data, subreddit)
+                total_fetched += 1
+    except (requests.RequestException, urllib3.exceptions.HTTPError, ijson.JSONError) as e:
+        logger.error("Error fetching r/%s: %s", subreddit, e)
+
+    logger.info("Fetched %d posts from r/%s (score >= %d)", total_fetched, subreddit, MIN_SCORE)
+
+
+def fetch_top_comment(post_id: str, subreddit: str, num_comments: int | None = None) -> dict | None:
     """
     Fetch the top comment for a specific post.
+    When num_comments is given, results are cached on disk keyed on
+    (post_id, num_comments): unchanged posts are served without a request,
+    and a new comment on the post invalidates its entry.
     """
+    cache_key = f"{post_id}:{num_comments}"
+    if num_comments is not None:
+        cached = comment_cache.get(cache_key)
+        if cached is not None:
+            return cached or None  # {} = post has no top comment
+
     url = f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/.json"
-    headers = {"User-Agent": USER_AGENT}
     params = {"limit": 1, "sort": "top", "raw_json": 1}
 
+    _reddit_limiter.acquire()  # Shared with listing requests, across threads
+
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = _session.get(url, params=params)
         response.raise_for_status()
-        data = response.json()
+        _respect_rate_limit(response)
+        _, comment_listing = _comments_decoder.decode(response.content)
+    except (requests.RequestException, msgspec.DecodeError) as e:
+        logger.warning("Error fetching comments for %s: %s", post_id, e)
+        return None  # Not cached, retried next run
+
+    top_comment = {}
+    # Comments are in the second element of the response
+    comments = comment_listing.data.children
+    if comments and comments[0].kind == "t1":
+        comment_data = comments[0].data
+        top_comment = {
+            "comment_id": comment_data.id,
+            "comment_body": _truncate(comment_data.body, 1000),
+            "comment_score": comment_data.score,
+            "comment_author": comment_data.author,
+        }
+
+    if num_comments is not None:
+        comment_cache.set(cache_key, top_comment)
+    return top_comment or None
+
+
+def fetch_top_comments(posts: Iterable[dict], subreddit: str) -> list[dict]:
+    """
+    Fetch the top comment of each post concurrently and merge it into the post.
+    Requests overlap on a thread pool; the shared rate limiter keeps the
+    overall request rate at REDDIT_REQUESTS_PER_SECOND.
+    Posts can be a generator (e.g. fetch_subreddit_posts): each comment
+    request starts as soon as its post arrives, and at most
+    COMMENT_QUEUE_SIZE posts wait for a worker before the listing is paused.
+    Posts known to have no comments are passed through without a request.
+    """
+    pending = threading.BoundedSemaphore(COMMENT_WORKERS + COMMENT_QUEUE_SIZE)
+
+    def fetch(post):
+        try:
+            top_comment = fetch_top_comment(post["id"], subreddit, post.get("num_comments"))
+            if top_comment:
+                post.update(top_comment)
+        except Exception as e:
+            logger.warning("Comment fetch failed for %s: %s", post["id"], e)
+        finally:
+            pending.release()
+
+    fetched = []
+    with ThreadPoolExecutor(max_workers=COMMENT_WORKERS) as executor:
+        for post in posts:
+            fetched.append(post)
+            num_comments = post.get("num_comments")
+            if num_comments is not None and num_comments < MIN_COMMENTS_FOR_FETCH:
+                continue
 
-        # Comments are in the second element of the response
-        if len(data) > 1:
-            comments = data[1].get("data", {}).get("children", [])
-            if comments and comments[0].get("kind") == "t1":
-                comment_data = comments[0].get("data", {})
-                return {
-                    "comment_id": comment_data.get("id"),
-                    "comment_body": comment_data.get("body", "")[:1000],
-                    "comment_score": comment_data.get("score", 0),
-                    "comment_author": comment_data.get("author"),
-                }
-    except requests.RequestException as e:
-        print(f"Error fetching comments for {post_id}: {e}")
+            pending.acquire()  # Back-pressure on the producer
+            executor.submit(fetch, post)
 
-    return None
+    return fetched
 
 
 def fetch_all_posts(with_comments: bool = True) -> list[dict]:
@@ -113,19 +275,16 @@ def fetch_all_posts(with_comments: bool = True) -> list[dict]:
     all_posts = []
 
     for subreddit in SUBREDDITS:
-        print(f"\nFetching r/{subreddit}...")
+        logger.info("Fetching r/%s...", subreddit)
+        posts = fetch_subreddit_posts(subreddit)
 
-        for post in fetch_subreddit_posts(subreddit):
-            # Fetch top comment if requested
-            if with_comments:
-                top_comment = fetch_top_comment(post["id"], subreddit)
-                if top_comment:
-                    post.update(top_comment)
-                time.sleep(0.5)  # Rate limiting for comment requests
+        # Fetch top comments if requested, while the listing is still streaming
+        if with_comments:
+            posts = fetch_top_comments(posts, subreddit)
 
-            all_posts.append(post)
+        all_posts.extend(posts)
 
-    print(f"\nTotal: {len(all_posts)} posts fetched")
+    logger.info("Total: %d posts fetched", len(all_posts))
     return all_posts
 
 
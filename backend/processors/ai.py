@@ -3,15 +3,24 @@ AI processing - categorizes and summarizes posts with Groq or DeepSeek
 """
 import json
 import re
+import threading
 import time
-from openai import OpenAI
-from groq import Groq
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from backend.config import (
-    AI_PROVIDER,
-    GROQ_API_KEY, GROQ_MODEL,
-    DEEPSEEK_API_KEY, DEEPSEEK_MODEL, DEEPSEEK_BASE_URL,
-    CATEGORIES, CATEGORY_DESCRIPTIONS
+    SETTINGS,
+    GROQ_MODEL,
+    DEEPSEEK_MODEL, DEEPSEEK_BASE_URL,
+    CATEGORIES, CATEGORY_DESCRIPTIONS, CATEGORY_INDEX,
+    CACHE_DIR,
 )
+from backend.cache import DiskCache, make_key
+from backend.ratelimit import RateLimiter
+
+# AI responses cached across runs (disable with llm_cache.enabled = False)
+llm_cache = DiskCache(CACHE_DIR / "llm")
+
+_DIGIT_RE = re.compile(r'\d')
 
 
 def extract_financial_data(text: str) -> dict:
@@ -20,7 +29,8 @@ def extract_financial_data(text: str) -> dict:
     Returns a dict with extracted data.
     """
     extracted = {
-        "amounts": [],           # All monetary amounts found
+        "amounts": [],           # All monetary amounts found (largest first)
+        "montant_max": None,     # Largest amount
         "patrimoine": None,      # Net worth if mentioned
         "revenus_annuels": None, # Annual income
         "revenus_mensuels": None,# Monthly income
@@ -29,7 +39,8 @@ def extract_financial_data(text: str) -> dict:
         "duree_annees": None,    # Duration in years
     }
 
-    if not text:
+    # No digits means no amount, age or duration to find
+    if not text or not _DIGIT_RE.search(text):
         return extracted
 
     text_lower = text.lower()
@@ -78,7 +89,9 @@ def extract_financial_data(text: str) -> dict:
                     pass
 
     # Remove duplicates and sort
-    extracted["amounts"] = sorted(list(set(amounts_found)), reverse=True)
+    extracted["amounts"] = sorted(set(amounts_found), reverse=True)
+    if extracted["amounts"]:
+        extracted["montant_max"] = extracted["amounts"][0]
 
     # Extract patrimoine (net worth)
     patrimoine_patterns = [
@@ -239,32 +252,133 @@ def retry_with_backoff(func, max_retries=5, base_delay=2):
 # Lazy-initialized clients (avoids import-time issues with .env loading)
 _groq_client = None
 _deepseek_client = None
+_client_lock = threading.Lock()  # process_posts calls this from worker threads
 
 
 def get_ai_client():
-    """Get or create AI client based on AI_PROVIDER setting."""
+    """Get or create AI client based on the AI_PROVIDER setting."""
+    with _client_lock:
+        return _get_ai_client()
+
+
+def _get_ai_client():
     global _groq_client, _deepseek_client
 
-    if AI_PROVIDER == "deepseek":
+    if SETTINGS.ai_provider == "deepseek":
         if _deepseek_client is None:
-            if not DEEPSEEK_API_KEY:
+            if not SETTINGS.deepseek_api_key:
                 print("Warning: DEEPSEEK_API_KEY not set")
                 return None, None, None
+            from openai import OpenAI  # Imported here: only the configured provider's SDK is loaded
             _deepseek_client = OpenAI(
-                api_key=DEEPSEEK_API_KEY,
+                api_key=SETTINGS.deepseek_api_key,
                 base_url=DEEPSEEK_BASE_URL
             )
         return _deepseek_client, DEEPSEEK_MODEL, "deepseek"
     else:
         # Default: Groq
         if _groq_client is None:
-            if not GROQ_API_KEY:
+            if not SETTINGS.groq_api_key:
                 print("Warning: GROQ_API_KEY not set")
                 return None, None, None
-            _groq_client = Groq(api_key=GROQ_API_KEY)
+            from groq import Groq
+            _groq_client = Groq(api_key=SETTINGS.groq_api_key)
         return _groq_client, GROQ_MODEL, "groq"
 
 
+def complete(client, model: str, prompt: str, max_tokens: int, parse):
+    """
+    Send a prompt to the AI (with retry logic) and return parse(response text).
+    Parsed results are cached on disk by model + prompt, so re-running on
+    already-seen posts doesn't pay for the same AI call twice.
+    parse must raise on an unusable reply: nothing is cached then, and the
+    call is made again on the next run.
+    """
+    key = make_key("parsed", model, max_tokens, prompt)  # Not the raw-text keys of older runs
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def make_api_call():
+        return client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=max_tokens,
+        )
+
+    response = retry_with_backoff(make_api_call)
+    result = parse(response.choices[0].message.content)
+    llm_cache.set(key, result)
+    return result
+
+
+# Prompt parts that don't depend on the post, built once at import
+# (category descriptions help the AI classify)
+CATEGORY_LIST = "\n".join(f"- {cat}: {CATEGORY_DESCRIPTIONS.get(cat, '')}" for cat in CATEGORIES)
+
+PROMPT_RULES = f"""CATÉGORIES DISPONIBLES:
+{CATEGORY_LIST}
+
+RÈGLES:
+- category: choisis LA catégorie principale qui correspond LE MIEUX au post
+- IMPORTANT: Utilise "Milestone" pour les posts où quelqu'un partage sa réussite financière avec des montants
+- IMPORTANT: Utilise "Question" pour les demandes d'aide personnelles avec situation concrète
+- IMPORTANT: Utilise "Retour XP" pour les retours d'expérience détaillés
+- tags: 2-5 mots-clés spécifiques (noms d'ETF, SCPI, stratégies mentionnées)
+- summary: résumé factuel du post
+- consensus: évalue si la communauté est d'accord (basé sur score et commentaire)
+- key_advice: le conseil actionnable principal
+
+Réponds UNIQUEMENT avec le JSON, pas de texte avant ou après."""
+
+
+def parse_ai_json(result_text: str):
+    """Parse a JSON AI response, handling potential markdown code blocks."""
+    result_text = result_text.strip()
+    if result_text.startswith("```"):
+        result_text = result_text.split("```")[1]
+        if result_text.startswith("json"):
+            result_text = result_text[4:]
+
+    return json.loads(result_text)
+
+
+def parse_post_result(result_text: str) -> dict:
+    """Parse the AI response for a single post (a JSON object)."""
+    ai_result = parse_ai_json(result_text)
+    if not isinstance(ai_result, dict):
+        raise ValueError("expected a JSON object")
+    return ai_result
+
+
+def apply_ai_result(post: dict, ai_result: dict) -> dict:
+    """Enrich post with AI analysis and regex-extracted financial data."""
+    # Validate category is in allowed list
+    category = ai_result.get("category", "Autre")
+    post["category"] = category if category in CATEGORY_INDEX else "Autre"
+    post["tags"] = ai_result.get("tags", [])
+    post["summary"] = ai_result.get("summary", "")
+    post["consensus"] = ai_result.get("consensus", "")
+    post["key_advice"] = ai_result.get("key_advice", "")
+
+    # Extract financial data from text
+    full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
+    post["extracted_data"] = extract_financial_data(full_text)
+    return post
+
+
+def apply_ai_failure(post: dict) -> dict:
+    """Mark post as not analysed ("Autre"); financial data is still extracted."""
+    post["category"] = "Autre"
+    post["tags"] = []
+    post["summary"] = ""
+    # Still extract financial data even if AI fails
+    full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
+    post["extracted_data"] = extract_financial_data(full_text)
+    return post
+
+
 def categorize_and_summarize(post: dict) -> dict:
     """
     Use AI (Groq or DeepSeek) to categorize and summarize a Reddit post.
@@ -281,9 +395,6 @@ def categorize_and_summarize(post: dict) -> dict:
     content = post.get("selftext", "")[:1500]
     top_comment = post.get("comment_body", "")[:500]
 
-    # Build category descriptions for better AI classification
-    cat_desc = "\n".join([f"- {cat}: {CATEGORY_DESCRIPTIONS.get(cat, '')}" for cat in CATEGORIES])
-
     prompt = f"""Analyse ce post Reddit sur la finance personnelle (en français).
 
 TITRE: {title}
@@ -301,99 +412,142 @@ Réponds en JSON avec ce format exact:
     "key_advice": "le conseil clé à retenir"
 }}
 
-CATÉGORIES DISPONIBLES:
-{cat_desc}
-
-RÈGLES:
-- category: choisis LA catégorie principale qui correspond LE MIEUX au post
-- IMPORTANT: Utilise "Milestone" pour les posts où quelqu'un partage sa réussite financière avec des montants
-- IMPORTANT: Utilise "Question" pour les demandes d'aide personnelles avec situation concrète
-- IMPORTANT: Utilise "Retour XP" pour les retours d'expérience détaillés
-- tags: 2-5 mots-clés spécifiques (noms d'ETF, SCPI, stratégies mentionnées)
-- summary: résumé factuel du post
-- consensus: évalue si la communauté est d'accord (basé sur score et commentaire)
-- key_advice: le conseil actionnable principal
-
-Réponds UNIQUEMENT avec le JSON, pas de texte avant ou après."""
+{PROMPT_RULES}"""
 
     try:
-        # API call with retry logic
-        def make_api_call():
-            return client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=500,
-            )
+        ai_result = complete(client, model, prompt, max_tokens=500, parse=parse_post_result)
+        apply_ai_result(post, ai_result)
 
-        response = retry_with_backoff(make_api_call)
-        result_text = response.choices[0].message.content.strip()
+    except json.JSONDecodeError as e:
+        print(f"Error parsing AI response: {e}")
+        apply_ai_failure(post)
+    except Exception as e:
+        print(f"Error calling Groq API: {e}")
+        apply_ai_failure(post)
+
+    return post
 
-        # Parse JSON response
-        # Handle potential markdown code blocks
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
 
-        ai_result = json.loads(result_text)
+def categorize_batch(posts: list[dict], batch_size: int = 10, limiter: RateLimiter | None = None) -> list[dict]:
+    """
+    Categorize and summarize posts batch_size at a time, one AI call per batch.
+    The category list and rules are sent once per batch instead of once per post.
+    Falls back to per-post calls for a batch whose response can't be parsed;
+    with a limiter, each of those calls waits for its own slot. If the API
+    call itself fails, the batch's posts are marked as failed instead.
+    Returns the posts in input order.
+    """
+    processed = []
+    for start in range(0, len(posts), batch_size):
+        processed.extend(_categorize_chunk(posts[start:start + batch_size], limiter))
+    return processed
 
-        # Enrich post with AI analysis
-        # Validate category is in allowed list
-        category = ai_result.get("category", "Autre")
-        post["category"] = category if category in CATEGORIES else "Autre"
-        post["tags"] = ai_result.get("tags", [])
-        post["summary"] = ai_result.get("summary", "")
-        post["consensus"] = ai_result.get("consensus", "")
-        post["key_advice"] = ai_result.get("key_advice", "")
 
-        # Extract financial data from text
-        full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
-        extracted = extract_financial_data(full_text)
-        post["extracted_data"] = extracted
+def _categorize_chunk(posts: list[dict], limiter: RateLimiter | None = None) -> list[dict]:
+    """Send one batched prompt for a chunk of posts."""
+    client, model, provider = get_ai_client()
+    if not client:
+        print(f"Warning: AI client not configured, skipping AI processing")
+        return posts
+
+    print(f"  Using {provider} ({model}) for {len(posts)} posts")
+
+    posts_text = "\n\n".join(
+        f"""POST {i}
+TITRE: {post.get("title", "")}
+CONTENU: {post.get("selftext", "")[:1500]}
+TOP COMMENTAIRE: {post.get("comment_body", "")[:500]}"""
+        for i, post in enumerate(posts, start=1)
+    )
+
+    prompt = f"""Analyse ces {len(posts)} posts Reddit sur la finance personnelle (en français).
+
+{posts_text}
+
+Réponds avec un tableau JSON contenant exactement {len(posts)} objets, un par post, dans le même ordre:
+[
+    {{
+        "post": 1,
+        "category": "une des catégories listées ci-dessous",
+        "tags": ["tag1", "tag2", "tag3"],
+        "summary": "résumé en 1-2 phrases du conseil principal",
+        "consensus": "fort/moyen/faible/divisé",
+        "key_advice": "le conseil clé à retenir"
+    }}
+]
+
+{PROMPT_RULES}"""
+
+    def parse_results(result_text):
+        ai_results = parse_ai_json(result_text)
+        if not isinstance(ai_results, list) or len(ai_results) != len(posts):
+            raise ValueError(f"expected {len(posts)} results, got {len(ai_results) if isinstance(ai_results, list) else 'no list'}")
+        if not all(isinstance(r, dict) for r in ai_results):
+            raise ValueError("expected one JSON object per post")
+        return ai_results
 
-    except json.JSONDecodeError as e:
-        print(f"Error parsing AI response: {e}")
-        post["category"] = "Autre"
-        post["tags"] = []
-        post["summary"] = ""
-        # Still extract financial data even if AI fails
-        full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
-        post["extracted_data"] = extract_financial_data(full_text)
+    try:
+        ai_results = complete(client, model, prompt, max_tokens=500 * len(posts), parse=parse_results)
+    except ValueError as e:  # Includes json.JSONDecodeError: the reply was unusable
+        print(f"Batch AI response unusable, falling back to one call per post: {e}")
+        return _categorize_each(posts, limiter)
     except Exception as e:
-        print(f"Error calling Groq API: {e}")
-        post["category"] = "Autre"
-        post["tags"] = []
-        post["summary"] = ""
-        # Still extract financial data even if AI fails
-        full_text = f"{post.get('title', '')} {post.get('selftext', '')} {post.get('comment_body', '')}"
-        post["extracted_data"] = extract_financial_data(full_text)
+        # API failure (retries already exhausted): more calls would only add load
+        print(f"Error calling {provider} API for {len(posts)} posts: {e}")
+        return [apply_ai_failure(post) for post in posts]
 
-    return post
+    try:
+        # Match results by their "post" number, falling back to list position
+        by_number = {r.get("post"): r for r in ai_results}
+        return [
+            apply_ai_result(post, by_number.get(i) or ai_results[i - 1])
+            for i, post in enumerate(posts, start=1)
+        ]
+    except (AttributeError, TypeError, ValueError) as e:  # A result item with the wrong shape
+        print(f"Batch AI response unusable, falling back to one call per post: {e}")
+        return _categorize_each(posts, limiter)
+
+
+def _categorize_each(posts: list[dict], limiter: RateLimiter | None = None) -> list[dict]:
+    """Categorize posts one AI call each, waiting for the limiter before each call."""
+    processed = []
+    for post in posts:
+        if limiter:
+            limiter.acquire()  # Each fallback call is a separate API call
+        processed.append(categorize_and_summarize(post))
+    return processed
 
 
-def process_posts(posts: list[dict], delay_between_calls: float = 1.5) -> list[dict]:
+def process_posts(posts: list[dict], delay_between_calls: float = 1.5, max_workers: int = 4,
+                  batch_size: int = 1) -> list[dict]:
     """
     Process all posts with AI categorization and summarization.
-    Includes rate limiting delay between API calls.
+    API calls run on a small thread pool so network latency overlaps,
+    while a shared rate limiter keeps call starts delay_between_calls apart.
 
     Args:
         posts: List of posts to process
-        delay_between_calls: Seconds to wait between API calls (default 1.5s for Groq free tier)
+        delay_between_calls: Seconds between API call starts (default 1.5s for Groq free tier)
+        max_workers: Number of concurrent API calls
+        batch_size: Posts sent per AI call (see categorize_batch)
     """
-    processed = []
     total = len(posts)
+    limiter = RateLimiter(1.0 / delay_between_calls if delay_between_calls > 0 else 0)
+    chunks = [posts[start:start + batch_size] for start in range(0, total, batch_size)]
 
-    for i, post in enumerate(posts):
-        print(f"Processing {i+1}/{total}: {post['title'][:50]}...")
-        enriched_post = categorize_and_summarize(post)
-        processed.append(enriched_post)
+    def process_chunk(indexed_chunk):
+        i, chunk = indexed_chunk
+        limiter.acquire()  # Rate limiting - avoid 429s
+        first = i * batch_size + 1
+        if len(chunk) == 1:
+            print(f"Processing {first}/{total}: {chunk[0]['title'][:50]}...")
+            return [categorize_and_summarize(chunk[0])]
+        print(f"Processing {first}-{first + len(chunk) - 1}/{total}: {chunk[0]['title'][:50]}...")
+        return categorize_batch(chunk, batch_size=batch_size, limiter=limiter)
 
-        # Rate limiting - wait between calls to avoid 429s
-        if i < total - 1:  # Don't wait after the last call
-            time.sleep(delay_between_calls)
-
-    return processed
+    # map() keeps results in input order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [post for chunk in executor.map(process_chunk, enumerate(chunks)) for post in chunk]
 
 
 def find_similar_posts(posts: list[dict]) -> dict:
@@ -401,14 +555,13 @@ def find_similar_posts(posts: list[dict]) -> dict:
     Group similar posts/advice together for aggregation.
     Returns a dict with tag -> list of posts mapping.
     """
-    tag_groups = {}
+    tag_groups = defaultdict(list)
 
     for post in posts:
-        for tag in post.get("tags", []):
-            tag_lower = tag.lower()
-            if tag_lower not in tag_groups:
-                tag_groups[tag_lower] = []
-            tag_groups[tag_lower].append(post)
+        for tag in post.get("tags") or []:
+            tag_key = tag.strip().lower()
+            if tag_key:
+                tag_groups[tag_key].append(post)
 
     # Sort by number of posts (most mentioned first)
     sorted_groups = dict(sorted(tag_groups.items(), key=lambda x: len(x[1]), reverse=True))
@@ -0,0 +1,41 @@
+"""
+Thread-safe rate limiter shared by worker threads
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1/rate seconds apart across all threads.
+    Unlike a fixed sleep after each call, the wait overlaps with in-flight requests.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._deferrals = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller is allowed to make its call."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.interval
+                deferrals = self._deferrals
+
+            if wait > 0:
+                time.sleep(wait)
+
+            with self._lock:
+                if self._deferrals == deferrals:
+                    return
+            # defer() was called while we waited: take a new slot after the pause
+
+    def defer(self, seconds: float):
+        """Make every caller wait at least `seconds` from now (e.g. until a quota resets)."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+            self._deferrals += 1
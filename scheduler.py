@@ -3,10 +3,10 @@ Grepr scheduler - daily auto fetch with progress tracking
 """
 import json
 import os
-import time
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
-from backend.fetchers.reddit import fetch_subreddit_posts, fetch_top_comment
+from backend.fetchers.reddit import fetch_subreddit_posts, fetch_top_comments
 from backend.processors.ai import process_posts
 from backend.db.nocodb import push_posts, get_existing_post_ids
 from backend.config import SUBREDDITS, logger
@@ -15,6 +15,7 @@ from backend.config import SUBREDDITS, logger
 POSTS_PER_DAY_PER_SUBREDDIT = 500  # Max posts per subreddit per day
 PROGRESS_FILE = Path(__file__).parent / "scheduler_progress.json"
 AI_DELAY = 2.0  # Seconds between AI API calls (conservative for free tier)
+AI_BATCH_SIZE = 10  # Posts per AI call
 TARGET_YEARS_BACK = 1  # Fetch posts up to 1 year back (changed from 3)
 
 # Time periods for historical fetch (from newest to oldest)
@@ -51,25 +52,14 @@ def fetch_batch(subreddit: str, time_filter: str, limit: int, existing_ids: set)
     Fetch a batch of posts from a subreddit, filtering out already existing ones.
     Returns list of new posts.
     """
-    new_posts = []
-    for post in fetch_subreddit_posts(subreddit, time_filter=time_filter, limit=limit):
-        # Skip if we already have this post
-        if post["id"] in existing_ids:
-            continue
+    # Skip posts we already have, stop once the batch limit is reached
+    new_posts = (
+        post for post in fetch_subreddit_posts(subreddit, time_filter=time_filter, limit=limit)
+        if post["id"] not in existing_ids
+    )
 
-        # Fetch top comment
-        top_comment = fetch_top_comment(post["id"], subreddit)
-        if top_comment:
-            post.update(top_comment)
-
-        new_posts.append(post)
-        time.sleep(0.5)  # Rate limit for Reddit
-
-        # Stop if we've reached our batch limit
-        if len(new_posts) >= limit:
-            break
-
-    return new_posts
+    # Fetch top comments (concurrent, rate limited by the fetcher) as posts stream in
+    return fetch_top_comments(islice(new_posts, limit), subreddit)
 
 
 def run_scheduler(dry_run: bool = False):
@@ -142,7 +132,7 @@ def run_scheduler(dry_run: bool = False):
     # Process with AI
     if all_new_posts and not dry_run:
         logger.info(f"\n🤖 Processing {len(all_new_posts)} posts with AI...")
-        processed_posts = process_posts(all_new_posts, delay_between_calls=AI_DELAY)
+        processed_posts = process_posts(all_new_posts, delay_between_calls=AI_DELAY, batch_size=AI_BATCH_SIZE)
 
         # Push to NocoDB
         logger.info(f"\n📤 Pushing to NocoDB...")